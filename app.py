@@ -1,7 +1,13 @@
+import os
+from io import BytesIO
+
 import streamlit as st
 import pandas as pd
-import csv
-from io import StringIO
+
+# Arquivos Parquet para persistir o estado entre sessões (colunar, leitura rápida)
+ARQUIVO_PRODUTOS = "produtos.parquet"
+ARQUIVO_ESTOQUE = "estoque.parquet"
+ARQUIVO_VENDAS = "vendas.parquet"
 
 # Configuração inicial
 st.title("Controle de Estoque e Caixa para Festa Macarronada")
@@ -21,99 +27,211 @@ produtos_padrao = [
     {"nome": "Sorvete de Leite Condensado", "valor": 4.0, "quantidade": 35}
 ]
 
-# Sessões de estado para manter o estoque e as vendas
-if "produtos" not in st.session_state:
-    st.session_state.produtos = produtos_padrao.copy()
-    st.session_state.estoque = {produto["nome"]: produto["quantidade"] for produto in produtos_padrao}
-if "vendas" not in st.session_state:
-    st.session_state.vendas = []
-if "caixa" not in st.session_state:
-    st.session_state.caixa = 0.0
+# Função para inicializar o estado da sessão de uma vez só (retomando do disco se houver)
+def inicializar_estado():
+    if os.path.exists(ARQUIVO_PRODUTOS):
+        produtos_df = pd.read_parquet(ARQUIVO_PRODUTOS)
+    else:
+        produtos_df = pd.DataFrame(produtos_padrao)
+    st.session_state.produtos_df = produtos_df
+    st.session_state.produtos_styler = produtos_df.style.format({"valor": "R${:.2f}"})
+    st.session_state.precos = produtos_df.set_index("nome")["valor"].astype("float64")
+    if os.path.exists(ARQUIVO_ESTOQUE):
+        st.session_state.estoque_df = pd.read_parquet(ARQUIVO_ESTOQUE)
+    else:
+        st.session_state.estoque_df = produtos_df.set_index("nome")[["quantidade"]].rename(columns={"quantidade": "Quantidade"})
+        st.session_state.estoque_df.index.name = None
+    st.session_state.estoque = st.session_state.estoque_df["Quantidade"].astype("int64")
+    st.session_state.produto_nomes = produtos_df["nome"].tolist()
+    if os.path.exists(ARQUIVO_VENDAS):
+        st.session_state.linhas_venda = pd.read_parquet(ARQUIVO_VENDAS)
+    else:
+        st.session_state.linhas_venda = pd.DataFrame({
+            "venda_id": pd.Series(dtype="int64"),
+            "produto": pd.Series(dtype="object"),
+            "quantidade": pd.Series(dtype="int64"),
+            "valor_linha": pd.Series(dtype="float64"),
+        })
+    st.session_state.vendas = {
+        int(venda_id): {
+            "id": int(venda_id),
+            "produtos": dict(zip(grupo["produto"], grupo["quantidade"].astype(int))),
+            "produtos_str": ", ".join(f"{produto} ({quantidade})" for produto, quantidade in zip(grupo["produto"], grupo["quantidade"].astype(int))),
+            "valor_total": float(grupo["valor_linha"].sum()),
+        }
+        for venda_id, grupo in st.session_state.linhas_venda.groupby("venda_id")
+    }
+    st.session_state.next_venda_id = int(st.session_state.linhas_venda["venda_id"].max()) + 1 if len(st.session_state.linhas_venda) else 1
+    st.session_state.vendas_version = 0
+    st.session_state.vendas_dirty = True
+    st.session_state.caixa = float(st.session_state.linhas_venda["valor_linha"].sum())
+    st.session_state.em_estoque = st.session_state.estoque[st.session_state.estoque > 0]
+
+# Função para gravar o estado em Parquet, escrevendo só o que mudou
+def persistir_estado(produtos=False, estoque=False, vendas=False):
+    if produtos:
+        st.session_state.produtos_df.to_parquet(ARQUIVO_PRODUTOS, index=False)
+    if estoque:
+        st.session_state.estoque_df.to_parquet(ARQUIVO_ESTOQUE)
+    if vendas:
+        st.session_state.linhas_venda.to_parquet(ARQUIVO_VENDAS, index=False)
+
+# Sessão de estado para manter o estoque e as vendas
+if "estado_inicializado" not in st.session_state:
+    inicializar_estado()
+    st.session_state.estado_inicializado = True
 
 # Função para adicionar produto
 def adicionar_produto(nome, valor, quantidade):
-    st.session_state.produtos.append({"nome": nome, "valor": valor, "quantidade": quantidade})
+    st.session_state.produtos_df.loc[len(st.session_state.produtos_df)] = [nome, valor, quantidade]
     st.session_state.estoque[nome] = quantidade
+    st.session_state.precos[nome] = valor
+    st.session_state.produtos_styler = st.session_state.produtos_df.style.format({"valor": "R${:.2f}"})
+    st.session_state.estoque_df.loc[nome] = quantidade
+    st.session_state.produto_nomes = st.session_state.produtos_df["nome"].tolist()
+    st.session_state.em_estoque = st.session_state.estoque[st.session_state.estoque > 0]
+    persistir_estado(produtos=True, estoque=True)
 
 # Função para deletar produto
 def deletar_produto(nome):
-    st.session_state.produtos = [p for p in st.session_state.produtos if p["nome"] != nome]
-    del st.session_state.estoque[nome]
+    st.session_state.produtos_df = st.session_state.produtos_df[st.session_state.produtos_df["nome"] != nome].reset_index(drop=True)
+    st.session_state.estoque = st.session_state.estoque.drop(nome)
+    st.session_state.precos = st.session_state.precos.drop(nome, errors="ignore")
+    st.session_state.produtos_styler = st.session_state.produtos_df.style.format({"valor": "R${:.2f}"})
+    st.session_state.estoque_df = st.session_state.estoque_df.drop(nome)
+    st.session_state.produto_nomes = st.session_state.produtos_df["nome"].tolist()
+    st.session_state.em_estoque = st.session_state.estoque[st.session_state.estoque > 0]
+    persistir_estado(produtos=True, estoque=True)
 
 # Função para registrar venda
 def registrar_venda(produtos_venda):
-    valor_total = 0.0
-    for produto, quantidade in produtos_venda.items():
-        valor_produto = next(p["valor"] for p in st.session_state.produtos if p["nome"] == produto)
-        valor_total += quantidade * valor_produto
-        st.session_state.estoque[produto] -= quantidade
+    qtd = pd.Series(produtos_venda, dtype="int64")
+    if (qtd > st.session_state.estoque.loc[qtd.index]).any():
+        raise ValueError("Estoque insuficiente para a venda.")
+    valores = qtd * st.session_state.precos.loc[qtd.index]
+    valor_total = float(valores.sum())
+    venda_id = st.session_state.next_venda_id
+    novas_linhas = pd.DataFrame({
+        "venda_id": venda_id,
+        "produto": qtd.index,
+        "quantidade": qtd.values,
+        "valor_linha": valores.values,
+    })
 
-    venda_id = len(st.session_state.vendas) + 1
+    # Tudo calculado localmente; só agora o estado da sessão é tocado
+    st.session_state.next_venda_id += 1
+    st.session_state.estoque.loc[qtd.index] -= qtd
+    st.session_state.estoque_df.loc[qtd.index, "Quantidade"] = st.session_state.estoque.loc[qtd.index]
     st.session_state.caixa += valor_total
-    st.session_state.vendas.append({"id": venda_id, "produtos": produtos_venda, "valor_total": valor_total})
+    st.session_state.vendas[venda_id] = {
+        "id": venda_id,
+        "produtos": produtos_venda,
+        "produtos_str": ", ".join(f"{produto} ({quantidade})" for produto, quantidade in produtos_venda.items()),
+        "valor_total": valor_total,
+    }
+    st.session_state.linhas_venda = pd.concat([st.session_state.linhas_venda, novas_linhas], ignore_index=True)
+    st.session_state.vendas_version += 1
+    st.session_state.vendas_dirty = True
+    st.session_state.em_estoque = st.session_state.estoque[st.session_state.estoque > 0]
+    persistir_estado(estoque=True, vendas=True)
     return venda_id, valor_total
 
 # Função para deletar venda
 def deletar_venda(venda_id):
-    venda = next(v for v in st.session_state.vendas if v["id"] == venda_id)
-    for produto, quantidade in venda["produtos"].items():
-        st.session_state.estoque[produto] += quantidade
+    venda = st.session_state.vendas.pop(venda_id, None)
+    if venda is None:
+        return
+    qtd = pd.Series(venda["produtos"], dtype="int64")
+    st.session_state.estoque.loc[qtd.index] += qtd
+    st.session_state.estoque_df.loc[qtd.index, "Quantidade"] = st.session_state.estoque.loc[qtd.index]
 
     st.session_state.caixa -= venda["valor_total"]
-    st.session_state.vendas = [v for v in st.session_state.vendas if v["id"] != venda_id]
+    st.session_state.linhas_venda = st.session_state.linhas_venda[st.session_state.linhas_venda["venda_id"] != venda_id]
+    st.session_state.vendas_version += 1
+    st.session_state.vendas_dirty = True
+    st.session_state.em_estoque = st.session_state.estoque[st.session_state.estoque > 0]
+    persistir_estado(estoque=True, vendas=True)
 
-# Criação das abas
-tab1, tab2, tab3, tab4, tab5 = st.tabs(["Produtos e Caixa", "Registrar Venda", "Vendas", "Estoque", "Gerenciar Produtos"])
+# Função para montar a tabela de vendas (cacheada; o snapshot entra na chave porque o cache é compartilhado entre sessões)
+@st.cache_data
+def montar_vendas_df(versao, vendas_snapshot):
+    vendas_formatadas = [
+        {"ID": venda_id, "Produtos": produtos_str, "valor_total": valor_total}
+        for venda_id, produtos_str, valor_total in vendas_snapshot
+    ]
+    vendas_df = pd.DataFrame(vendas_formatadas)
+    if not vendas_df.empty:
+        vendas_df["Valor Total"] = "R$" + vendas_df.pop("valor_total").map("{:.2f}".format)
+    return vendas_df
 
-with tab1:
+# Navegação por abas via radio: só a aba ativa constrói seus widgets em cada rerun
+abas = ["Produtos e Caixa", "Registrar Venda", "Vendas", "Estoque", "Gerenciar Produtos"]
+aba_ativa = st.radio("Navegação", abas, horizontal=True, label_visibility="collapsed")
+
+if aba_ativa == "Produtos e Caixa":
     st.subheader("Produtos Disponíveis")
-    if st.session_state.produtos:
-        produtos_df = pd.DataFrame(st.session_state.produtos)
-        produtos_df['valor'] = produtos_df['valor'].apply(lambda x: f"R${x:.2f}")
-        st.table(produtos_df)
+    if not st.session_state.produtos_df.empty:
+        st.dataframe(st.session_state.produtos_styler, use_container_width=True, hide_index=True)
     else:
         st.write("Nenhum produto disponível.")
     
     st.subheader("Caixa")
     st.write(f"Valor em Caixa: R${st.session_state.caixa:.2f}")
 
-with tab2:
+if aba_ativa == "Registrar Venda":
     st.subheader("Registrar Venda")
     with st.form(key='registrar_venda'):
-        produtos_venda = {}
-        for produto in st.session_state.produtos:
-            quantidade = st.number_input(f"Quantidade de {produto['nome']}", min_value=0, max_value=st.session_state.estoque[produto["nome"]], step=1)
-            if quantidade > 0:
-                produtos_venda[produto["nome"]] = quantidade
+        em_estoque = st.session_state.em_estoque
+        carrinho_df = pd.DataFrame({
+            "Produto": em_estoque.index,
+            "Valor": st.session_state.precos.loc[em_estoque.index].values,
+            "Estoque": em_estoque.values,
+            "Quantidade": 0,
+        })
+        carrinho_editado = st.data_editor(
+            carrinho_df,
+            disabled=["Produto", "Valor", "Estoque"],
+            column_config={
+                "Valor": st.column_config.NumberColumn(format="R$%.2f"),
+                "Quantidade": st.column_config.NumberColumn(min_value=0, step=1),
+            },
+            hide_index=True,
+            use_container_width=True,
+        )
 
         venda_button = st.form_submit_button(label="Registrar Venda")
 
         if venda_button:
-            if produtos_venda:
+            selecionados = carrinho_editado[carrinho_editado["Quantidade"] > 0]
+            if (selecionados["Quantidade"] > selecionados["Estoque"]).any():
+                st.warning("Quantidade maior que o estoque disponível.")
+            elif not selecionados.empty:
+                produtos_venda = dict(zip(selecionados["Produto"], selecionados["Quantidade"].astype(int)))
                 venda_id, valor_total = registrar_venda(produtos_venda)
                 st.success(f"Venda registrada com sucesso! ID da Venda: {venda_id}, Valor Total: R${valor_total:.2f}")
             else:
                 st.warning("Nenhum produto selecionado.")
 
-with tab3:
+if aba_ativa == "Vendas":
     st.subheader("Vendas Realizadas")
-    vendas_formatadas = []
-    for venda in st.session_state.vendas:
-        produtos_formatados = ", ".join([f"{produto} ({quantidade})" for produto, quantidade in venda["produtos"].items()])
-        vendas_formatadas.append({"ID": venda["id"], "Produtos": produtos_formatados, "Valor Total": f"R${venda['valor_total']:.2f}"})
-    vendas_df = pd.DataFrame(vendas_formatadas)
-    st.table(vendas_df)
+    if st.session_state.vendas_dirty or "vendas_snapshot" not in st.session_state:
+        st.session_state.vendas_snapshot = tuple(
+            (venda["id"], venda["produtos_str"], venda["valor_total"])
+            for venda in st.session_state.vendas.values()
+        )
+        st.session_state.vendas_dirty = False
+    vendas_df = montar_vendas_df(st.session_state.vendas_version, st.session_state.vendas_snapshot)
+    st.dataframe(vendas_df, use_container_width=True, hide_index=True)
 
-    def gerar_csv(vendas_df):
-        csv_output = StringIO()
-        writer = csv.writer(csv_output)
-        writer.writerow(vendas_df.columns)
-        for index, row in vendas_df.iterrows():
-            writer.writerow(row)
-        return csv_output.getvalue()
+    @st.cache_data
+    def gerar_csv(versao, vendas_snapshot, _vendas_df):
+        buffer = BytesIO()
+        buffer.write(b"\xef\xbb\xbf")
+        _vendas_df.to_csv(buffer, index=False, encoding="utf-8")
+        return buffer.getvalue()
 
     if st.button("Gerar CSV das Vendas"):
-        csv_data = gerar_csv(vendas_df)
+        csv_data = gerar_csv(st.session_state.vendas_version, st.session_state.vendas_snapshot, vendas_df)
         st.download_button(label="Baixar CSV", data=csv_data, file_name="vendas_realizadas.csv", mime="text/csv")
         
     st.subheader("Deletar Venda")
@@ -122,18 +240,17 @@ with tab3:
         delete_venda_button = st.form_submit_button(label="Deletar Venda")
 
         if delete_venda_button:
-            if any(v["id"] == venda_id_del for v in st.session_state.vendas):
+            if venda_id_del in st.session_state.vendas:
                 deletar_venda(venda_id_del)
                 st.success(f"Venda ID {venda_id_del} deletada com sucesso!")
             else:
                 st.warning("ID da venda não encontrado.")
 
-with tab4:
+if aba_ativa == "Estoque":
     st.subheader("Estoque Atual")
-    estoque_df = pd.DataFrame.from_dict(st.session_state.estoque, orient='index', columns=['Quantidade'])
-    st.table(estoque_df)
+    st.dataframe(st.session_state.estoque_df, use_container_width=True)
 
-with tab5:
+if aba_ativa == "Gerenciar Produtos":
     st.subheader("Adicionar Produto")
     with st.form(key='add_produto'):
         nome_produto = st.text_input("Nome do Produto")
@@ -147,7 +264,7 @@ with tab5:
 
     st.subheader("Deletar Produto")
     with st.form(key='del_produto'):
-        nome_produto_del = st.selectbox("Selecione o Produto para Deletar", [p["nome"] for p in st.session_state.produtos])
+        nome_produto_del = st.selectbox("Selecione o Produto para Deletar", st.session_state.produto_nomes)
         delete_button = st.form_submit_button(label="Deletar Produto")
 
         if delete_button: